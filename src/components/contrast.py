@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import pathlib
-import re
+import functools
+import hashlib
+import json
 import logging
 import os.path
 import sys
+import threading
 import urllib.parse
 import tornado
 import tornado.iostream
 import tornado.httputil
 import tornado.web
+from collections import OrderedDict
 from enum import Enum
 
 from io import BufferedReader
@@ -17,10 +22,11 @@ from typing import (
     TYPE_CHECKING,
     Any,
     Optional,
+    Callable,
     Dict,
-    #List,
-    #Tuple,
-    #TypedDict,
+    List,
+    Tuple,
+    TypedDict,
     #Type
 )
 
@@ -33,9 +39,63 @@ from .slicers.generic_slicer import GenericSlicer
 from .slicers.prusa_slicer import PrusaSlicer 
 from .slicers.cura_slicer import CuraSlicer 
 from .slicers.orca_slicer import OrcaSlicer 
+from .slicers.bamboo_slicer import BambuStudio
+
+class SummaryResult(TypedDict):
+    """Results of Contrast.summarize()"""
+
+    added: List[str]
+    removed: List[str]
+    modified: Dict[str, Tuple[Any, Any]]
+    same: List[str]
+
+class DiffResult(TypedDict):
+    """Results of Contrast.diff()"""
+
+    left: Dict[str, Any]
+    right: Dict[str, Any]
+    opt_names: List[str]
+
+# Slicer names (as stored in the gcode metadata, after SLICER_ALIASES is applied) mapped to
+# the class used to parse their gcode files
+SLICER_CLASSES = {
+    "GenericSlicer": GenericSlicer,
+    "PrusaSlicer": PrusaSlicer,
+    "CuraSlicer": CuraSlicer,
+    "OrcaSlicer": OrcaSlicer,
+    "BambuStudio": BambuStudio
+}
 
 logging.basicConfig(stream=sys.stderr, level=logging.INFO)
 
+# Sentinel for options that are missing from one side of a comparison (None is a valid option value)
+_MISSING = object()
+
+class _HashedOptions:
+    """Slicer options wrapper that hashes/compares on the options content hash
+
+    Lets the (unhashable) options dicts be passed to lru_cache'd functions, with the hash stored
+    in the metadata by Contrast._update_metadata used as the cache key.
+    """
+
+    __slots__ = ("options", "options_hash")
+
+    def __init__(self, options: Dict, options_hash: str) -> None:
+        self.options = options
+        self.options_hash = options_hash
+
+    def __hash__(self) -> int:
+        return hash(self.options_hash)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _HashedOptions) and other.options_hash == self.options_hash
+
+@functools.lru_cache(maxsize=256)
+def _cached_comparison(compare: Callable, left: _HashedOptions, right: _HashedOptions) -> Dict:
+    # Since the key is the content hash of each side, a re-scanned file gets a new hash (and a
+    # new cache entry) without any explicit invalidation.
+    return compare(left.options, right.options)
+
 class Contrast:
 
     """A class for handling all the /server/files/slicer resource endpoints
@@ -64,17 +124,40 @@ class Contrast:
         Retrieve metadata for a specific gcode file
     """
 
+    __slots__ = (
+        "_logger",
+        "_moonraker_config",
+        "_server",
+        "_event_loop",
+        "name",
+        "_file_manager",
+        "_gcodes_root",
+        "_gcodes_root_prefix",
+        "_gcode_metadata",
+        "_options_cache",
+        "_options_cache_lock",
+        "_parse_semaphore",
+        "_slicer_registry"
+    )
+
     # Aliases used in Moonraker metadata that are aliased to the
     # slier class.
     SLICER_ALIASES = {
-        "Cura":"CuraSlier",
-        "BambuStudio":"BambuSlicer"
+        "Cura":"CuraSlicer"
    }
 
     METADATA_OPTS = "slicer_options"
+    METADATA_OPTS_HASH = "slicer_options_hash"
+    METADATA_OPTS_STAT = "slicer_options_stat"
     OPT_COMPARE_L = "left"
     OPT_COMPARE_R = "right"
 
+    # Max number of parsed slicer option sets to keep in memory
+    OPTIONS_CACHE_SIZE = 128
+
+    # Max number of gcode files to parse at the same time
+    PARSE_CONCURRENCY = 4
+
     _server: Server
     """instance of Moonrakers Server class, used to interface with other components"""
 
@@ -94,13 +177,33 @@ class Contrast:
 
         self._server = self._moonraker_config.get_server()
 
+        self._event_loop = self._server.get_event_loop()
+
         self.name = self._moonraker_config.get_name()
 
         self._file_manager = self._server.lookup_component("file_manager")
         self._gcodes_root = self._file_manager.get_directory("gcodes")
 
+        # Prefix used to build the full path of a gcode file from its (metadata) filename
+        self._gcodes_root_prefix = os.path.join(os.fspath(self._gcodes_root), "")
+
         self._gcode_metadata = self._file_manager.get_metadata_storage()
 
+        # Parsed slicer options, keyed by (filename, mtime, size)
+        self._options_cache = OrderedDict()
+
+        # The parses run in worker threads (up to PARSE_CONCURRENCY at once), which all use the cache
+        self._options_cache_lock = threading.Lock()
+
+        self._parse_semaphore = asyncio.Semaphore(self.PARSE_CONCURRENCY)
+
+        # Slicer classes by their metadata name, with the SLICER_ALIASES already resolved
+        self._slicer_registry = dict(SLICER_CLASSES)
+
+        for alias, slicer_name in self.SLICER_ALIASES.items():
+            if slicer_name in SLICER_CLASSES:
+                self._slicer_registry[alias] = SLICER_CLASSES[slicer_name]
+
         self._server.register_endpoint(
             "/server/files/slicer/configscan", ["POST"], self._handle_slicer_configscan_request)
 
@@ -112,6 +215,9 @@ class Contrast:
 
         self._server.register_endpoint(
             "/server/files/slicer/compare/summarize", ["GET"], self._handle_slicer_summarize_request)
+
+        self._server.register_endpoint(
+            "/server/files/slicer/compare/bulk", ["POST"], self._handle_slicer_compare_bulk_request)
     
     async def _handle_slicer_summarize_request(self, web_request: WebRequest) -> Dict:
         """Summarize gcode slicer option comparison web request handler
@@ -133,28 +239,30 @@ class Contrast:
         file_right = web_request.get_str("right")
         force_scan = web_request.get_boolean("scan", True)
 
-        meta_left = self._get_metadata(file_left)
+        # If both files need to be scanned, they get parsed concurrently (a file compared with
+        # itself is only scanned once)
+        if file_left == file_right:
+            meta_left = meta_right = await self._ensure_options(file_left, force_scan)
+        else:
+            meta_left, meta_right = await asyncio.gather(
+                self._ensure_options(file_left, force_scan),
+                self._ensure_options(file_right, force_scan))
 
-        if "slicer_options" not in meta_left:
+        if self.METADATA_OPTS not in meta_left:
             if not force_scan:
                 return {"error": f"No slicer_options found for left file {file_left}"}
-            self._retrieve_options(file_left)
-
-            meta_left = self._get_metadata(file_left)
-            if "slicer_options" not in meta_left:
-                return {"error": f"No slicer_options found for left file {file_left}, and scan did not save slicer_options"}
-
 
-        options_left = meta_left.get("slicer_options")
+            return {"error": f"No slicer_options found for left file {file_left}, and scan did not save slicer_options"}
 
-        meta_right = self._get_metadata(file_right)
+        options_left = meta_left.get(self.METADATA_OPTS)
 
-        if "slicer_options" not in meta_right:
+        if self.METADATA_OPTS not in meta_right:
             return {"error": f"No slicer_options found in metadata for right file {file_right}"}
 
-        options_right = meta_right.get("slicer_options")
+        if self._same_options(meta_left, meta_right):
+            return SummaryResult(added=[], removed=[], modified={}, same=list(options_left))
 
-        return self.summarize(options_left, options_right)
+        return self._compare(self.summarize, meta_left, meta_right)
 
     async def _handle_slicer_compare_request(self, web_request: WebRequest) -> Dict:
         """Gcode slicer option comparison web request handler
@@ -175,36 +283,39 @@ class Contrast:
         file_left = web_request.get_str("left")
         file_right = web_request.get_str("right")
         output_format = web_request.get_str("format", None)
-        compat_mode = web_request.get_boolean("compatibility", True)
         include_all_options = web_request.get_boolean("all", True)
 
 
-        meta_left = self._get_metadata(file_left)
+        meta_left, meta_right = await asyncio.gather(
+            self._get_metadata_async(file_left),
+            self._get_metadata_async(file_right))
 
-        if not meta_left or "slicer_options" not in meta_left:
+        if not meta_left or self.METADATA_OPTS not in meta_left:
             return {"error": f"No metadata found for left file {file_left}"}
 
-        options_left = meta_left.get("slicer_options")
+        options_left = meta_left.get(self.METADATA_OPTS)
 
-        meta_right = self._get_metadata(file_right)
-
-        if not meta_right or "slicer_options" not in meta_right:
+        if not meta_right or self.METADATA_OPTS not in meta_right:
 
             return {"error": f"No slicer_options found in metadata for right file {file_right}"}
 
-        options_right = meta_right.get("slicer_options")
+        options_right = meta_right.get(self.METADATA_OPTS)
 
         if output_format == "itemized":
             # Itemized mode will split up the diff in a format that each value is stored under a
             # key that matches the option value
             slicer_right = self._get_slicer_obj(file_right)
 
+            # Names of the right side options that were matched to a left side option (directly or
+            # via an alias). Tracked separately so the (cached) right metadata is never mutated.
+            matched_right = set()
+
             results = {}
 
             for name_left, value_left in options_left.items():
                 option_right = slicer_right.get_option(name_left, True)
 
-                if not option_right or type(option_right) is not dict:
+                if not option_right or not isinstance(option_right, dict):
                     
                     if include_all_options is True:
                         # If the opt doesn't exist, but were including everything, then add a new
@@ -215,34 +326,95 @@ class Contrast:
                     continue
 
                 value_right =  option_right.get("value", None)
+                name_right = option_right.get("name")
+
+                # The matched names are only needed to find the leftover right side options
+                if include_all_options is True:
+                    matched_right.add(name_right)
 
                 if value_left == value_right:
                     continue
 
                 result = {"left": value_left, "right": value_right}
 
-                if name_left != option_right.get("name"):
-                    name_right = option_right.get("name")
-
+                if name_left != name_right:
                     result.update(right_opt=name_right)
 
-                    del options_right[name_right]
-
                 results[name_left] =  result
 
             if include_all_options is True:
                 # If there are any keys left in the right config, then those are values that didn't exist on the
                 # left (even with aliases). Add those options with no left value.
                 for name_right, value_right in options_right.items():
-                    results[name_right] = {"left": None, "right": value_right}
+                    if name_right not in matched_right:
+                        results[name_right] = {"left": None, "right": value_right}
 
             return results
         
         metadata = {"left": meta_left, "right": meta_right}
 
-        results = {"metadata": metadata, "diff": self.diff(options_left, options_right)}
+        if self._same_options(meta_left, meta_right):
+            return {"metadata": metadata, "diff": DiffResult(left={}, right={}, opt_names=[])}
+
+        results = {"metadata": metadata, "diff": self._compare(self.diff, meta_left, meta_right)}
         return results
         
+    async def _handle_slicer_compare_bulk_request(self, web_request: WebRequest) -> Dict:
+        """Bulk gcode slicer option comparison web request handler
+
+        Diffs the slicer options of several pairs of gcode files in one request. Each file is
+        only retrieved (and scanned, if its slicer options haven't been saved yet) once, even
+        if it's used in more than one pair.
+
+        Parameter
+        ---------
+        web_request: WebRequest
+            The WebRequest object (from Moonraker), with a "pairs" list of objects that each
+            have a "left" and "right" filename, and an optional "scan" boolean
+
+        Returns
+        -------
+        result: Dict
+            The "results" list, with the diff (or error) for each pair, in the order requested
+        """
+
+        pairs = web_request.get_list("pairs")
+        force_scan = web_request.get_boolean("scan", True)
+
+        for pair in pairs:
+            if not isinstance(pair, dict) or not all(
+                    isinstance(pair.get(side), str) and pair.get(side)
+                    for side in (self.OPT_COMPARE_L, self.OPT_COMPARE_R)):
+                return {"error": f"Each pair requires a left and right filename, got {pair}"}
+
+        filenames = list(dict.fromkeys(
+            pair.get(side) for pair in pairs for side in (self.OPT_COMPARE_L, self.OPT_COMPARE_R)))
+
+        # The scans themselves are limited by the parse semaphore in _retrieve_options
+        metadata = dict(zip(filenames, await asyncio.gather(
+            *(self._ensure_options(filename, force_scan) for filename in filenames))))
+
+        results = []
+
+        for pair in pairs:
+            file_left = pair.get(self.OPT_COMPARE_L)
+            file_right = pair.get(self.OPT_COMPARE_R)
+            meta_left = metadata[file_left]
+            meta_right = metadata[file_right]
+
+            result = {"left": file_left, "right": file_right}
+
+            if not meta_left or self.METADATA_OPTS not in meta_left:
+                result["error"] = f"No metadata found for left file {file_left}"
+            elif not meta_right or self.METADATA_OPTS not in meta_right:
+                result["error"] = f"No slicer_options found in metadata for right file {file_right}"
+            else:
+                result["diff"] = self._compare(self.diff, meta_left, meta_right)
+
+            results.append(result)
+
+        return {"results": results}
+
     async def _handle_slicer_configdata_request(self, web_request: WebRequest) -> Dict:
         """Gcode config data retriever web request handler
 
@@ -267,7 +439,7 @@ class Contrast:
 
         return {"slicer": metadata.get("slicer", None), 
                 "slicer_version": metadata.get("slicer_version"), 
-                "slicer_options": metadata.get("slicer_options", None)}
+                "slicer_options": metadata.get(self.METADATA_OPTS, None)}
 
     async def _handle_slicer_configscan_request(self, web_request: WebRequest) -> Dict:
         """Gcode config data scanner web request handler
@@ -285,46 +457,144 @@ class Contrast:
             The metadata for the file, along with the "config" item.
         """
         
-        args = web_request.get_args()
         filename = web_request.get_str("filename")
         save = web_request.get_boolean("save", True)
-        slicer_module = self._get_slicer_obj(filename)
 
-        slicer_module.parse()
+        return await self._retrieve_options(filename, save)
 
-        metadata = self._gcode_metadata.get(filename, None)
+    async def _retrieve_options(self, filename: str, save: bool = True, metadata: Optional[Dict] = None) -> Dict:
+        """Parse (and optionally save) the slicer options for a gcode file
+
+        Parameter
+        ---------
+        filename: str
+            Gcode filename to parse the slicer options from
+
+        save: bool
+            Save the parsed options to the files metadata
+
+        metadata: Optional[Dict]
+            The files current metadata, if the caller already retrieved it. When saving, the
+            parsed options are added to this same dict.
+
+        Returns
+        -------
+        result: Dict
+            The filename, slicer info and the parsed slicer options
+        """
+
+        # Parsing reads through the gcode file, so keep it off of the event loop (and limit how
+        # many files get read at once)
+        if metadata is None:
+            metadata = self._gcode_metadata.get(filename, None)
+
+        async with self._parse_semaphore:
+            slicer_options, stat_key = await self._event_loop.run_in_thread(
+                self._parse_options, filename, metadata)
      
         slicer_name = metadata.get("slicer")
 
         self._logger.info(f"Done parsing {filename} with {slicer_name} gcode options processor")
 
         if save:
-            self._update_metadata(filename, {"slicer_options":slicer_module.get_options()})
+            self._update_metadata(filename, {self.METADATA_OPTS:slicer_options,
+                                             self.METADATA_OPTS_STAT:stat_key}, metadata)
 
         return {"filename":filename,
                 "slicer":slicer_name, 
                 "slicer_version":metadata.get("slicer_version", None),
-                "slicer_options":slicer_module.get_options()}
+                "slicer_options":slicer_options}
 
+    async def _ensure_options(self, filename: str, scan: bool = True) -> Dict:
+        """Retrieve the metadata for a gcode file, scanning for its slicer options if needed
 
-    def _retrieve_options(self, filename: str, save: bool = True):
-        slicer_module = self._get_slicer_obj(filename)
+        Parameter
+        ---------
+        filename: str
+            Gcode filename to get the metadata for
 
-        slicer_module.parse()
+        scan: bool
+            Parse (and save) the slicer options if they aren't in the metadata yet
 
-        metadata = self._gcode_metadata.get(filename, None)
-     
-        slicer_name = metadata.get("slicer")
+        Returns
+        -------
+        result: Dict
+            The metadata dictionary (which may still be missing the slicer options if the
+            scan was disabled or didn't find any)
+        """
 
-        self._logger.info(f"Done parsing {filename} with {slicer_name} gcode options processor")
+        metadata = await self._get_metadata_async(filename)
 
-        if save:
-            self._update_metadata(filename, {"slicer_options":slicer_module.get_options()})
+        # Files without a slicer that has a parser class can't be scanned
+        if not scan or self.METADATA_OPTS in metadata \
+                or metadata.get("slicer") not in self._slicer_registry:
+            return metadata
 
-        return {"filename":filename,
-                "slicer":slicer_name, 
-                "slicer_version":metadata.get("slicer_version", None),
-                "slicer_options":slicer_module.get_options()}
+        # Saving the scanned options updates this same metadata dict, so there's no need to
+        # look it up again. If the scan fails, the metadata is returned without the options, and
+        # the caller responds with its own "No slicer_options found" error.
+        try:
+            await self._retrieve_options(filename, True, metadata)
+        except (AttributeError, EOFError, ValueError, OSError) as err:
+            self._logger.info(f"Unable to scan the slicer options of {filename}: {err}")
+
+        return metadata
+
+    def _parse_options(self, filename: str, metadata: Optional[Dict] = None) -> Tuple[Optional[Dict], Optional[List[int]]]:
+        """Parse the slicer options from a gcode file
+
+        The parsed options are cached by the files name, mtime and size, so re-scanning a file
+        that hasn't changed doesn't read through the gcode again. The size and mtime are also
+        saved to the metadata along with the options, so that holds across restarts too. This
+        does blocking file I/O, so it should be run in a worker thread.
+
+        Parameter
+        ---------
+        filename: str
+            Gcode filename to parse the slicer options from
+
+        metadata: Optional[Dict]
+            The files current metadata, to reuse the options from if they were saved for this
+            same size and mtime
+
+        Returns
+        -------
+        result: Tuple[Optional[Dict], Optional[List[int]]]
+            The parsed slicer options, and the [size, mtime] of the file they were parsed from
+        """
+
+        try:
+            stat = os.stat(self._gcodes_root_prefix + filename)
+            # A list rather than a tuple, since that's what it comes back as from the metadata
+            stat_key = [stat.st_size, stat.st_mtime_ns]
+            cache_key = (filename, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stat_key = cache_key = None
+
+        if stat_key is not None and metadata and self.METADATA_OPTS in metadata \
+                and metadata.get(self.METADATA_OPTS_STAT) == stat_key:
+            return metadata[self.METADATA_OPTS], stat_key
+
+        if cache_key is not None:
+            with self._options_cache_lock:
+                cached_options = self._options_cache.get(cache_key)
+
+                if cached_options is not None:
+                    self._options_cache.move_to_end(cache_key)
+                    return cached_options, stat_key
+
+        slicer_module = self._get_slicer_obj(filename)
+        slicer_module.parse()
+        slicer_options = slicer_module.get_options()
+
+        if cache_key is not None:
+            with self._options_cache_lock:
+                self._options_cache[cache_key] = slicer_options
+
+                if len(self._options_cache) > self.OPTIONS_CACHE_SIZE:
+                    self._options_cache.popitem(last=False)
+
+        return slicer_options, stat_key
 
     def _get_metadata(self, filename: str) -> Optional[Dict]:
         """Retrieve metadata for a specific gcode file
@@ -343,7 +613,10 @@ class Contrast:
             The metadata dictionary
         """
 
-        filename = filename.split("/")[-1]
+        filename = os.path.basename(filename)
+
+        # Not cached here: MetadataStorage.get() is an in memory lookup that already hands back a
+        # copy, and Moonraker updates the metadata (eg: the print history) without touching the file
         metadata = self._gcode_metadata.get(filename, None)
 
         if not metadata: 
@@ -351,7 +624,16 @@ class Contrast:
 
         return metadata
 
-    def _update_metadata(self, filename: str, data: Dict) -> Optional[Dict]:
+    async def _get_metadata_async(self, filename: str) -> Optional[Dict]:
+        """Retrieve metadata for a specific gcode file without blocking the event loop
+
+        Same as _get_metadata, but the lookup (and the copy of the metadata it makes) is done in
+        a worker thread, which lets the handlers fetch the left and right metadata concurrently.
+        """
+
+        return await self._event_loop.run_in_thread(self._get_metadata, filename)
+
+    def _update_metadata(self, filename: str, data: Dict, metadata: Optional[Dict] = None) -> Optional[Dict]:
         """Update metadata with object via filename
 
         Update the metadata for a file using Moonrakers file_manager.get_metadata_storage() 
@@ -365,23 +647,100 @@ class Contrast:
         data: Optional[Dict]
            The new data to apply to this files metadata.
 
+        metadata: Optional[Dict]
+           The files current metadata, if the caller already retrieved it (saves looking it
+           up again). This dict gets updated and written back to the storage.
+
         Returns
         -------
         result: Dict[str, Any]
             The updated metadata dictionary for this file
         """
         
-        metadata = self._get_metadata(filename);
+        if metadata is None:
+            metadata = self._get_metadata(filename);
 
         if not metadata: 
             return None;
 
+        if self.METADATA_OPTS in data:
+            metadata[self.METADATA_OPTS_HASH] = self._options_hash(data[self.METADATA_OPTS])
+
         metadata.update(data)
 
-        self._gcode_metadata.insert(filename, metadata.copy())
+        # MetadataStorage.get() already hands back a copy, so the updated dict can be written
+        # back as-is
+        self._gcode_metadata.insert(filename, metadata)
 
         return metadata;
 
+    def _options_hash(self, options: Optional[Dict]) -> Optional[str]:
+        """Generate a content hash of a slicer options dictionary
+
+        Parameter
+        ---------
+        options: Optional[Dict]
+            The slicer options to hash
+
+        Returns
+        -------
+        result: Optional[str]
+            Hex digest of the (key sorted) options, or None if there were no options
+        """
+
+        if options is None:
+            return None
+
+        # Always the json module, so the stored hashes don't depend on whether orjson is installed (and
+        # orjson can't serialize the ints wider than 64 bits that _cast can produce)
+        serialized = json.dumps(options, sort_keys=True, default=str).encode()
+
+        return hashlib.blake2b(serialized, digest_size=16).hexdigest()
+
+    def _same_options(self, meta_left: Dict, meta_right: Dict) -> bool:
+        """Check if two metadata objects are known to have identical slicer options
+
+        This only compares the hashes stored by _update_metadata, so metadata that was saved
+        without one is never considered the same (and gets diffed normally).
+        """
+
+        hash_left = meta_left.get(self.METADATA_OPTS_HASH)
+
+        return hash_left is not None and hash_left == meta_right.get(self.METADATA_OPTS_HASH)
+
+    def _compare(self, compare: Callable, meta_left: Dict, meta_right: Dict) -> Dict:
+        """Run a comparison of two files slicer options, reusing previous results when possible
+
+        Parameter
+        ---------
+        compare: Callable
+            The comparison method to run (summarize or diff)
+
+        meta_left: Dict
+            Metadata of the left file (must include the slicer options)
+
+        meta_right: Dict
+            Metadata of the right file (must include the slicer options)
+
+        Returns
+        -------
+        result: Dict
+            The comparison results (these may be shared with the cache, so don't modify them)
+        """
+
+        options_left = meta_left.get(self.METADATA_OPTS)
+        options_right = meta_right.get(self.METADATA_OPTS)
+        hash_left = meta_left.get(self.METADATA_OPTS_HASH)
+        hash_right = meta_right.get(self.METADATA_OPTS_HASH)
+
+        # Options saved before the hashes were added can't be cached
+        if hash_left is None or hash_right is None:
+            return compare(options_left, options_right)
+
+        return _cached_comparison(compare,
+                                  _HashedOptions(options_left, hash_left),
+                                  _HashedOptions(options_right, hash_right))
+
     def _get_slicer_obj(self, filename: str):
         """Gcode config data scanner web request handler
 
@@ -406,40 +765,52 @@ class Contrast:
             return {"error":f"No metadata found for {filename}"}
 
         slicer_name = metadata.get("slicer")
+        slicer_class = self._slicer_registry.get(slicer_name)
 
-        if slicer_name not in globals():
+        if slicer_class is None:
             return {"error":f"No config parser class found for slicer {slicer_name}"}
 
         self._logger.info(f"Gcode file {filename} was sliced with {slicer_name}")
 
-
-        file_path = f"{self._gcodes_root}/{filename}"
-
-        return globals()[slicer_name]( 
-                filename=file_path, 
+        # A new instance every time, since parse() fills in the instance's options (parsed options
+        # are cached by _parse_options instead)
+        return slicer_class( 
+                filename=self._gcodes_root_prefix + filename, 
                 server=self._server, 
                 logging=logging 
             )
     
-    def summarize(self, left: Dict, right: Dict) -> Dict:
-        left_options = set(left.keys())
-        right_options = set(right.keys())
-
-        shared_keys = left_options.intersection(right_options)
-        added = left_options-right_options
-        removed = right_options-left_options
-
-        modified = {option: (left[option], right[option]) for option in shared_keys if left[option] != right[option]}
-        same = set(option for option in shared_keys if left[option] == right[option])
-
-        return {
-            "added":list(added), 
-            "removed":list(removed),
-            "modified":dict(modified),
-            "same":list(same)
-        }
-
-    def diff(self, left: Dict, right: Dict) -> Dict:
+    def summarize(self, left: Dict, right: Dict) -> SummaryResult:
+        # Comparing a file with itself (or with identical options) needs no classifying
+        if left is right or left == right:
+            return SummaryResult(added=[], removed=[], modified={}, same=list(left))
+
+        # Each left option is classified with a single lookup in the right dict, then the right
+        # dict only needs to be walked for the options that were removed
+        added = []
+        modified = {}
+        same = []
+
+        for option, value_left in left.items():
+            value_right = right.get(option, _MISSING)
+
+            if value_right is _MISSING:
+                added.append(option)
+            elif value_left == value_right:
+                same.append(option)
+            else:
+                modified[option] = (value_left, value_right)
+
+        removed = [option for option in right if option not in left]
+
+        return SummaryResult(
+            added=added,
+            removed=removed,
+            modified=modified,
+            same=same
+        )
+
+    def diff(self, left: Dict, right: Dict) -> DiffResult:
         """
         Diff two dictionary data objects
 
@@ -468,25 +839,34 @@ class Contrast:
         Dict[left|right, Dict[option: str, value: str]]
         """
 
-        result = {}
+        if left is right or left == right:
+            return DiffResult(left={}, right={}, opt_names=[])
 
-        left_set = set(left.items())
-        right_set = set(right.items())
+        # Use set operations on the key views (which only hash the option names), then compare
+        # the values of the shared options directly. Building sets of the items would require
+        # every value to be hashable, and hashes every value even when it ends up matching.
+        keys_left = left.keys()
+        keys_right = right.keys()
 
-        result["left"] = left_set - right_set
-        result["right"] = right_set - left_set
+        left_only = {option: left[option] for option in keys_left - keys_right}
+        right_only = {option: right[option] for option in keys_right - keys_left}
 
-        updated_keys = list(result["left"])
-        updated_keys.extend(list(result["right"]))
+        for option in keys_left & keys_right:
+            value_left = left[option]
+            value_right = right[option]
 
-        result["left"] = self._sort_dict(dict(result["left"]))
-        result["right"] = self._sort_dict(dict(result["right"]))
-        result["opt_names"] = sorted(list(dict(updated_keys)))
+            if value_left != value_right:
+                left_only[option] = value_left
+                right_only[option] = value_right
 
-        return result
+        # Sort the option names once, then build both sides in that order
+        opt_names = sorted(left_only.keys() | right_only.keys())
 
-    def _sort_dict(self, data: Dict) -> Dict:
-        return dict(sorted(data.items()))
+        return DiffResult(
+            left={option: left_only[option] for option in opt_names if option in left_only},
+            right={option: right_only[option] for option in opt_names if option in right_only},
+            opt_names=opt_names
+        )
 
 def load_component(config: ConfigHelper) -> Contrast:
     return Contrast(config)
\ No newline at end of file
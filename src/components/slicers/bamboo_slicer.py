@@ -1,45 +1,88 @@
 from __future__ import annotations
 
 import logging
+import mmap
 import os
 import io
 import re
+import sys
 from io import BufferedReader
+from types import MappingProxyType
 from typing import (
     TYPE_CHECKING,
     Any,
     Optional,
     Dict,
     List,
+    Mapping,
     Union
 )
 
+if TYPE_CHECKING:
+    from logging import Logger
+    from ...server import Server
+
+from .generic_slicer import GenericSlicer
+
+# The begin/end lines of the config block, compiled once at import. These are bytes patterns, since
+# they're matched against the lines of the memory mapped file.
+OPTIONS_START_PATTERN: re.Pattern = re.compile(rb"^;.*_config = begin$")
+OPTIONS_END_PATTERN: re.Pattern = re.compile(rb"^;.*_config = end$")
+
+# Matches the `; key = value` lines inside of the config block
+OPTION_LINE_PATTERN: re.Pattern = re.compile(rb"^; (?P<key>[a-zA-Z0-9_-]+) = (?P<val>.*)$")
+
+OPTION_ALIASES: Mapping[str, str] = MappingProxyType({
+    # These associations were taken from the legacy handler, mostly:
+    # https://github.com/bambulab/BambuStudio/blob/60a792b76cd39a69970608d6346dd134d20ee663/src/libslic3r/PrintConfig.cpp#L4614-L4739
+    "enable_wipe_tower": "enable_prime_tower",
+    "wipe_tower_width": "prime_tower_width",
+    "bottom_solid_infill_flow_ratio": "initial_layer_flow_ratio",
+    "wiping_volume": "prime_volume",
+    "wipe_tower_brim_width": "prime_tower_brim_width",
+    "tool_change_gcode": "change_filament_gcode",
+    "bridge_fan_speed": "overhang_fan_speed",
+    "infill_extruder": "sparse_infill_filament",
+    "solid_infill_extruder": "solid_infill_filament",
+    "perimeter_extruder": "wall_filament",
+    "support_material_extruder": "support_filament",
+    "support_material_interface_extruder": "support_interface_filament"
+    # Todo...
+})
+
+# The same aliases, keyed by the BambuStudio option name (for files that still use the legacy names)
+OPTION_ALIASES_REVERSED: Mapping[str, str] = MappingProxyType(
+    {name: alias for alias, name in OPTION_ALIASES.items()})
+
 class BambuStudio(object):
-    _options_start_pattern: str = r"^;.*_config = begin$"
-    _options_end_pattern: str = r"^;.*_config = end$"
-
-    _option_aliases = {
-        # These associations were taken from the legacy handler, mostly:
-        # https://github.com/bambulab/BambuStudio/blob/60a792b76cd39a69970608d6346dd134d20ee663/src/libslic3r/PrintConfig.cpp#L4614-L4739
-        "enable_wipe_tower": "enable_prime_tower",
-        "wipe_tower_width": "prime_tower_width",
-        "bottom_solid_infill_flow_ratio": "initial_layer_flow_ratio",
-        "wiping_volume": "prime_volume",
-        "wipe_tower_brim_width": "prime_tower_brim_width",
-        "tool_change_gcode": "change_filament_gcode",
-        "bridge_fan_speed": "overhang_fan_speed",
-        "infill_extruder": "sparse_infill_filament",
-        "solid_infill_extruder": "solid_infill_filament",
-        "perimeter_extruder": "wall_filament",
-        "support_material_extruder": "support_filament",
-        "support_material_interface_extruder": "support_interface_filament"
-        # Todo...
-    }
+    _options_start_pattern: re.Pattern = OPTIONS_START_PATTERN
+    _options_end_pattern: re.Pattern = OPTIONS_END_PATTERN
+    _parse_reversed: bool = True
+
+    # Shared (read only) by every instance
+    _option_aliases: Mapping[str, str] = OPTION_ALIASES
+    _option_aliases_reversed: Mapping[str, str] = OPTION_ALIASES_REVERSED
     
-    def __init__(self, filename: str, regex_groups: Dict[str, Any]) -> None:
+    # Takes the same arguments as the GenericSlicer based classes, so Contrast can create it the same
+    # way. The regex_groups (slicer and version) can still be given directly instead of coming from
+    # the files metadata.
+    def __init__(self, filename: str, server: Optional[Server] = None, logging: Logger = logging,
+                 regex_groups: Optional[Dict[str, Any]] = None) -> None:
+        self._logger = logging.getLogger(self.__class__.__name__)
         self._filename = filename
-        #self._matched_data = regex_groups
-        pass
+        self._matched_data: Dict[str, Any] = dict(regex_groups or {})
+        self._options = {}
+
+        if server is not None:
+            metadata = server.lookup_component("file_manager").get_metadata_storage().get(
+                os.path.basename(filename), None) or {}
+
+            if not self._matched_data:
+                self._matched_data = {"slicer": metadata.get("slicer"), "version": metadata.get("slicer_version")}
+
+            # Start with any options that were already scanned and saved in the metadata, the same
+            # as the GenericSlicer classes do, so get_option() works without a parse().
+            self._options = dict(metadata.get("slicer_options", None) or {})
 
     @property
     def version(self) -> str|float|None:
@@ -54,10 +97,73 @@ class BambuStudio(object):
         return self._matched_data.get("slicer", None)
 
     def parse(self) -> Any:
-        #print(f"Parsing gcode made by {self._matched_data.get("slicer", None)}")
-        print(f"\tReverse parse: {self._parse_reversed}")
-        print(f"\tConfig start line: {self._options_start_pattern}")
-        print(f"\tConfig end line: {self._options_end_pattern}")
+        self._logger.debug("Parsing %s (reverse parse: %s)", self._filename, self._parse_reversed)
+
+        self._options = {}
+
+        # The config block is at the very end of the file, so rather than reading the file line by
+        # line, search backwards through a memory map of it for the end and begin markers, and only
+        # split/parse the bytes between them.
+        # No config block raises an EOFError, the same as the other slicers
+        with open(self._filename, "rb") as file_handle:
+            if os.fstat(file_handle.fileno()).st_size == 0:
+                raise EOFError("No options found")
+
+            with mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as gcode:
+                block_end = self._find_marker_line(gcode, b"_config = end", self._options_end_pattern, len(gcode))
+
+                if block_end is None:
+                    raise EOFError("No options found")
+
+                block_start = self._find_marker_line(gcode, b"_config = begin", self._options_start_pattern, block_end[0])
+
+                if block_start is None:
+                    raise EOFError("No options found")
+
+                # Everything between the end of the begin line and the start of the end line
+                block = gcode[block_start[1]:block_end[0]]
+
+        for line in block.splitlines():
+            parsed_line = OPTION_LINE_PATTERN.match(line)
+
+            if parsed_line:
+                # Cast the same way as the other slicers, so the values compare equal across slicers.
+                # BambuStudio isn't a GenericSlicer subclass, but _cast doesn't rely on any instance state.
+                self._options[sys.intern(parsed_line.group("key").decode("utf-8"))] = GenericSlicer._cast(
+                    self, parsed_line.group("val").decode("utf-8"))
+
+    # Find the last line in gcode[:end] that contains the text (found with rfind) and is a real begin or
+    # end line, according to the pattern. Returns the (start, end) offsets of that line, or None.
+    def _find_marker_line(self, gcode: mmap.mmap, text: bytes, pattern: re.Pattern, end: int):
+        while (index := gcode.rfind(text, 0, end)) != -1:
+            line_start = gcode.rfind(b"\n", 0, index) + 1
+            line_end = gcode.find(b"\n", index, end)
+            line_end = end if line_end == -1 else line_end
+
+            if pattern.match(gcode[line_start:line_end].strip()):
+                return line_start, line_end
+
+            end = line_start
+
+        return None
+
+    def get_options(self) -> Dict[str, Any]:
+        return self._options
+
+    # Get value by name. This will also check the aliased names (in both directions) if the name
+    # isn't found in the gcode opts, each being a single dict lookup.
+    def get_option(self, name: str, aliases: bool = False) -> Optional[Dict[str, Any]]:
+        if name in self._options:
+            return {"name": name, "value": self._options[name]}
+
+        if not aliases:
+            return None
+
+        for alias_name in (self._option_aliases.get(name), self._option_aliases_reversed.get(name)):
+            if alias_name is not None and alias_name in self._options:
+                return {"name": alias_name, "value": self._options[alias_name]}
+
+        return None
 
 if __name__ == "__main__" and __package__ is None:
     __package__ = "slicers.bamboo_slicer.BambooSlicer"
\ No newline at end of file
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import logging
+import mmap
 import os
 import json
 import re
 import sys
 from io import BufferedReader
+from types import MappingProxyType
 from .generic_slicer import GenericSlicer
 
 
@@ -15,6 +17,13 @@ Cura string replacements:
     Extruder definitions: https://github.com/Ultimaker/Cura/blob/master/resources/definitions/fdmextruder.def.json
 """
 
+# The settings footer lines are matched as raw bytes, so only the matching lines get decoded
+SETTING_LINE_PATTERN = re.compile(rb"^;SETTING_(?P<gcode_version>[0-9]) (?P<line>.+)$")
+OPTION_LINE_PATTERN = re.compile(r"^\s*(?P<key>[^=]+?)\s*=\s*(?P<val>.*?)\s*$")
+
+# The line right above the SETTING lines, kept as bytes so it can be compared before decoding anything
+END_OF_GCODE = b";End of Gcode"
+
 class CuraSlicer(GenericSlicer):
     _parse_reversed = True
     _options_end_pattern = None
@@ -44,10 +53,10 @@ class CuraSlicer(GenericSlicer):
         "brim_separation":"brim_gap"
     }
 
-    _alias_modifiers = {
-        ("elefant_foot_compensation", "xy_offset_layer_0"): lambda option_value: self._invert_number(option_value),
-        ("brim_separation", "brim_gap"): lambda option_value: self._invert_number(option_value)
-    }
+    _alias_modifiers = MappingProxyType({
+        "elefant_foot_compensation": GenericSlicer._invert_number,
+        "brim_separation": GenericSlicer._invert_number
+    })
     
     # Gcode parser for config
     def parse(self):
@@ -60,62 +69,57 @@ class CuraSlicer(GenericSlicer):
         #         an array with an array of objects).
         #     5) Split the results by \n, and use regex to match for `key = value` format
         #     6) Add each key/value to the self._options dictionary
-        raw_options = list()
-        with open(self._filename, "rb") as file_handle:
-            segment = None
-            offset = 0
-            end_of_options = False
-            file_handle.seek(0, os.SEEK_END)
-            file_size = remaining_size = file_handle.tell()
+        raw_options = []
+        with open(self._file_path, "rb") as file_handle:
+            # mmap can't map an empty file, and there'd be nothing to find in one anyways
+            if os.fstat(file_handle.fileno()).st_size:
+                with mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as gcode:
+                    self._prefetch_tail(gcode)
 
-            while remaining_size > 0 and end_of_options is False:
-                offset = min(file_size, offset + self._buffer_size)
-                file_handle.seek(file_size - offset)
-                buffer = file_handle.read(min(remaining_size, self._buffer_size))
+                    # The SETTING lines are the very last lines in the file, so walk up from the end one
+                    # line at a time, which only ever touches the pages the footer is on
+                    end = len(gcode)
 
-                # remove file's last "\n" if it exists, only for the first buffer
-                if remaining_size == file_size and buffer[-1] == ord("\n"):
-                    buffer = buffer[:-1]
+                    # skip the file's last "\n" if it exists
+                    if gcode[end - 1] == ord("\n"):
+                        end -= 1
 
-                remaining_size -= self._buffer_size
-                lines = buffer.split("\n".encode())
+                    while end > 0:
+                        start = gcode.rfind(b"\n", 0, end)
+                        line = gcode[start + 1:end]
+                        end = start
 
-                
-                # yield lines in this chunk except the segment
-                for line in reversed(lines):
-                    decoded_line = line.decode()
+                        if line == END_OF_GCODE:
+                            break
 
-                    if ( decoded_line == self._options_end_pattern):
-                        end_of_options = True
-                        break
+                        parsed_line = SETTING_LINE_PATTERN.match(line)
+                        if not parsed_line: 
+                            break
 
-                    parsed_line = re.match(r"^;SETTING_(?P<gcode_version>[0-9]) (?P<line>.+)$", decoded_line)
-                    if not parsed_line: 
-                        break
+                        detected_gcode_version = parsed_line.group("gcode_version")
 
-                    detected_gcode_version = parsed_line.group("gcode_version")
-
-                    new_line = parsed_line.group("line")
-                    raw_options.insert(0, new_line)
+                        new_line = parsed_line.group("line").decode()
+                        raw_options.append(new_line)
 
+        # The lines were collected bottom up, so flip them back once before joining
+        raw_options.reverse()
         raw_options = "".join(raw_options)
         gcode_json = json.loads(raw_options)
-        gcode_sections = []
-
-        for a in gcode_json.values():
-            if isinstance(a, str):
-                gcode_sections.append(a)
-            elif isinstance(a, list):
-                for b in a:
-                    gcode_sections.append(b)
-
-        data = "".join(gcode_sections)
-
-        for line in data.split("\\n"):
-            line_data = re.match(r"^(?P<key>.*) = (?P<val>.*)$", line.strip())
-            if line_data:
-                # Add this to the gcode config, finally..
-                self._options[line_data.group("key")] =  self._cast(line_data.group("val"))
+
+        # Each section is its own INI blob (or a list of them for the extruders), so go through them one
+        # at a time rather than gluing them all back together into one big string first
+        for section in gcode_json.values():
+            if isinstance(section, str):
+                section = (section,)
+            elif not isinstance(section, list):
+                continue
+
+            for blob in section:
+                for line in blob.split("\\n"):
+                    line_data = OPTION_LINE_PATTERN.match(line)
+                    if line_data:
+                        # Add this to the gcode config, finally..
+                        self._options[sys.intern(line_data.group("key"))] =  self._cast(line_data.group("val"))
 
 
 if __name__ == "__main__" and __package__ is None:
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 #import logging
+import mmap
 import os
 import re
 import sys
 from io import BufferedReader
 from enum import Enum
+from functools import lru_cache
+from types import MappingProxyType
 from collections.abc import Sequence, Callable
 #from dataclasses import dataclass
 from typing import (
@@ -19,6 +22,8 @@ from typing import (
     Union,
     Dict,
     List,
+    Mapping,
+    Tuple,
     Awaitable
 )
 
@@ -28,17 +33,64 @@ if TYPE_CHECKING:
     from ...confighelper import ConfigHelper
     from ..file_manager.file_manager import FileManager, MetadataStorage
 
+# Compiled once at import, these get matched against every line of the options block
+OPTION_LINE_PATTERN = re.compile(r"^[\s;]*([a-zA-Z0-9_\s-]+) = (.+)$")
+# Same pattern, for matching the raw lines from the reverse reader before anything gets decoded
+OPTION_LINE_BYTES_PATTERN = re.compile(rb"^[\s;]*([a-zA-Z0-9_\s-]+) = (.+)$")
+
+# The characters a numeric value, or a true/false/none value, can start with (see _cast)
+NUMBER_FIRST_CHARACTERS = frozenset("+-0123456789")
+CONSTANT_FIRST_CHARACTERS = frozenset("tTfFn")
+REGEX_METACHARACTERS = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+@lru_cache(maxsize=32)
+def _compile_pattern(pattern: Optional[str], as_bytes: bool = False) -> Optional[re.Pattern]:
+    """Compile a begin/end pattern (None if there isn't one), shared by every slicer class using it"""
+
+    if not pattern:
+        return None
+
+    return re.compile(pattern.encode() if as_bytes else pattern)
+
+def _literal_marker(pattern: Optional[str]) -> Optional[bytes]:
+    """Return the pattern as bytes if it only ever matches a fixed line prefix, otherwise None"""
+
+    if not pattern:
+        return None
+
+    # Sliced rather than str.removeprefix/removesuffix, which would need Python 3.9
+    literal = pattern[1:] if pattern.startswith("^") else pattern
+    literal = literal[:-1] if literal.endswith("$") else literal
+    if REGEX_METACHARACTERS.search(literal):
+        return None
+
+    return literal.encode()
+
 class GenericSlicer(object):
     IterStatus = Enum('IterStatus', ['NONE', 'BEGIN', 'END', 'ERROR'])
     _filename: str
+    _file_path: str
     _cast_values: bool = True
     _parse_reversed: bool = True
-    _buffer_size: int = 8192
+    # How much of the end of the file to ask the kernel to read in ahead of the reverse walk
+    _prefetch_size: int = 262144
 
     # These begin/end lines match PrusaSlicer and most of their legacy versions.
     _options_start_pattern: Optional[str] = r"^;.*_config = begin$"
     _options_end_pattern: Optional[str] = r"^;.*_config = end$"
 
+    # Compiled versions of the above (None if the slicer has no such pattern). Subclasses get theirs
+    # compiled once when the class is created, in __init_subclass__
+    _options_start_re: Optional[re.Pattern] = _compile_pattern(_options_start_pattern)
+    _options_end_re: Optional[re.Pattern] = _compile_pattern(_options_end_pattern)
+    _options_start_bytes_re: Optional[re.Pattern] = _compile_pattern(_options_start_pattern, True)
+    _options_end_bytes_re: Optional[re.Pattern] = _compile_pattern(_options_end_pattern, True)
+
+    # When the patterns are just plain text (eg: "; CONFIG_BLOCK_START"), the raw lines can be checked with
+    # bytes.startswith before anything gets decoded or run through a regex. None if they're real patterns.
+    _options_start_marker: Optional[bytes] = None
+    _options_end_marker: Optional[bytes] = None
+
     # Used to determine the status of the parser (has it started? ended? found anything? etc). This is
     # useful since we go over the options line by line, and not always in the same direction.
     _parse_status: Dict 
@@ -54,21 +106,32 @@ class GenericSlicer(object):
     _option_aliases: Dict = {}
 
     # if a comparison is done with compatibility enabled, any slicer option configs that are compared to
-    # aliased values, they can also be modified by creating a lambda function here with the local option
-    # name as the root key, then the aliased key in the nested dictionary
-    _alias_modifiers: Dict = {}
+    # aliased values, they can also be modified by adding a function here, keyed by the alias option
+    # name (the option it's stored under is already in _option_aliases)
+    _alias_modifiers: Mapping[str, Callable] = MappingProxyType({})
+
+    # Both of the above resolved into one read-only table, so get_option only needs a single lookup.
+    # Built once per class, in __init_subclass__.
+    #     KEY: The option name being asked for
+    #     VALUE: (The option name it's stored under, the modifier to apply to it or None)
+    _option_lookup: Mapping[str, Tuple[str, Optional[Callable]]] = MappingProxyType({})
 
     _logger: Logger
     _file_manager: FileManager
     _metadata: MetadataStorage
-    _file_metadata: Dict = {} 
+    _file_metadata: Dict
 
     # The gcode slicer options will get stored here.
-    _options: Dict = {}
+    _options: Dict
     
     def __init__(self, filename: str, server: Server, logging: Logger) -> None:
         self._logger = logging.getLogger(self.__class__.__name__);
 
+        # Set per instance, so one slicer's options never end up in a dict shared by the whole class
+        self._parse_status = {}
+        self._file_metadata = {}
+        self._options = {}
+
         if not server:
             self._logger.error("No moonraker server object provided")
             return;
@@ -79,12 +142,35 @@ class GenericSlicer(object):
 
         self._server = server
         self._file_manager = self._server.lookup_component("file_manager")
-        self._gcode_root = self._file_manager.get_directory("gcodes")
-        self._filename = filename.split("/")[-1]
+        # The full path is built once by the caller (relative to the gcodes root), the base
+        # filename is what the metadata is stored under
+        self._file_path = filename
+        self._filename = os.path.basename(filename)
         self._logger.info(f"Loading gcode file {self._filename}")
         self._metadata = self._file_manager.get_metadata_storage()
-        self._file_metadata = self._metadata.get(self._filename, None)
-        self._options = self._file_metadata.get("slicer_options", None)
+        self._file_metadata = self._metadata.get(self._filename, None) or {}
+        self._options = dict(self._file_metadata.get("slicer_options", None) or {})
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+
+        cls._options_start_re = _compile_pattern(cls._options_start_pattern)
+        cls._options_end_re = _compile_pattern(cls._options_end_pattern)
+        cls._options_start_bytes_re = _compile_pattern(cls._options_start_pattern, True)
+        cls._options_end_bytes_re = _compile_pattern(cls._options_end_pattern, True)
+        cls._option_lookup = cls._build_option_lookup()
+        cls._options_start_marker = _literal_marker(cls._options_start_pattern)
+        cls._options_end_marker = _literal_marker(cls._options_end_pattern)
+
+    # Walking a mapped file backwards faults its pages in one at a time, so hint the kernel to read
+    # the tail (where the options usually are) in one go. Not every platform has madvise.
+    def _prefetch_tail(self, gcode: mmap.mmap) -> None:
+        if not hasattr(mmap, "MADV_WILLNEED"):
+            return
+
+        # madvise needs a page aligned start offset
+        start = max(0, len(gcode) - self._prefetch_size) & ~(mmap.PAGESIZE - 1)
+        gcode.madvise(mmap.MADV_WILLNEED, start, len(gcode) - start)
 
     @property 
     def file(self):
@@ -97,78 +183,73 @@ class GenericSlicer(object):
     # This is used to iterate over the file from the bottom up
     def _reverse_gcode_reader(self):
         in_options = False
-        is_completed = False
         options_count = 0
-        #gcode_settings = {}
+        start_marker = self._options_start_marker
+        end_marker = self._options_end_marker
+        # Looked up once here instead of through self on every line
+        iter_begin = self.IterStatus.BEGIN
+        iter_end = self.IterStatus.END
 
         try:
             """A generator that returns the lines of a file in reverse order"""
-            with open(self._filename, "rb") as file_handle:
-                segment = None
-                offset = 0
-                file_handle.seek(0, os.SEEK_END)
-                file_size = remaining_size = file_handle.tell()
-
-                while remaining_size > 0:
-                    offset = min(file_size, offset + buf_size)
-                    file_handle.seek(file_size - offset)
-                    buffer = file_handle.read(min(remaining_size, buf_size))
-
-                    # remove file's last "\n" if it exists, only for the first buffer
-                    if remaining_size == file_size and buffer[-1] == ord("\n"):
-                        buffer = buffer[:-1]
-
-                    remaining_size -= buf_size
-                    lines = buffer.split("\n".encode())
-
-                    # append last chunk's segment to this chunk's last line
-                    if segment is not None:
-                        lines[-1] += segment
-
-                    segment = lines[0]
-                    lines = lines[1:]
-                    # yield lines in this chunk except the segment
-                    for line in reversed(lines):
-                        # only decode on a parsed line, to avoid utf-8 decode error
-                        this_line = self._handle_line(line)
+            with open(self._file_path, "rb") as file_handle:
+                # mmap can't map an empty file, and there'd be no options in one anyways
+                if not os.fstat(file_handle.fileno()).st_size:
+                    return
+
+                # Walking the mapped file up one line at a time with rfind means there's no chunks to
+                # read and no partial lines to stitch back together across them, and only the pages
+                # that actually get walked over are read from disk.
+                with mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as gcode:
+                    self._prefetch_tail(gcode)
+                    end = len(gcode)
+
+                    # If the end line is plain text, jump straight to it with a single rfind instead of
+                    # walking (and handling) every line of gcode that comes after the options block
+                    if end_marker is not None and (footer := gcode.rfind(end_marker)) != -1:
+                        footer_end = gcode.find(b"\n", footer)
+                        end = footer_end if footer_end != -1 else end
+
+                    while end > 0:
+                        start = gcode.rfind(b"\n", 0, end)
+                        line = gcode[start + 1:end].rstrip(b"\r")
+                        end = start
+
+                        # Check for plain text begin/end lines on the raw bytes first
+                        if start_marker is not None and line.startswith(start_marker):
+                            this_line = iter_end
+                        elif end_marker is not None and line.startswith(end_marker):
+                            this_line = iter_begin
+                        else:
+                            # only decode on a parsed line, to avoid utf-8 decode error
+                            this_line = self._handle_line(line)
 
                         # If we've reached the ending line (which is the line that contains 
                         # prusaslicer_config = 'begin' since were reading it in reverse order), 
                         # then determine what exception to raise..
-                        if this_line is self.IterStatus.END:
+                        if this_line is iter_end:
                             # if we've somehow come here without ever having hit the begin
                             # line, then raise an EOF.
                             if in_options is False:
                                 raise EOFError("Encountered ending line without ever being in the footer")
 
-                            # Otherwise, end the generator
-                            raise GeneratorExit("Encountered ending")
+                            # Otherwise, end the generator (GeneratorExit is what close() throws into a
+                            # generator, so it shouldn't be raised to stop one)
+                            return
 
                         # If we've come across the beginning line (or prusaslicer_config = 'end'), 
                         # then verify this was the first time.
-                        if this_line is self.IterStatus.BEGIN:
+                        if this_line is iter_begin:
                             if in_options is True:
                                 raise ValueError("Encountered the beginning line while already in slicer options")
 
                             in_options = True
                             continue
 
-                        if type(this_line) is dict:
+                        if isinstance(this_line, tuple):
                             options_count = options_count+1
                             yield this_line
 
-                # Don't yield None if the file was empty
-                if segment is not None:
-                    this_line = self._handle_line(segment)
-                    if this_line is self.IterStatus.END:
-                        raise GeneratorExit("Encountered ending")
-
-                    if type(this_line) is dict:
-                        options_count = options_count+1
-                        yield this_line
-
-        except GeneratorExit as ge:
-            pass
         finally:
             if options_count == 0:
                 raise EOFError("No slicer options found")
@@ -179,58 +260,46 @@ class GenericSlicer(object):
     # Get value by name. This will also use any aliased names if the name isn't found in the gcode opts
     # dictionary.
     def get_option(self, name: str, aliases: bool = False) -> Any:
-        # If there's no options with this name in the _options, then check if there's an
-        # alias for it, and use that if so.
-
         # If the name key DOES exist in the local slicer opts data, return it
         if name in self._options:
             return {
                 "name":name, 
-                "value":self._options.get(name, None)
+                "value":self._options[name]
             }
 
         # If it doesn't, then check to see if it has an alias, if not then return None
-        if name not in self._option_aliases:
+        lookup = self._option_lookup.get(name, None)
+        if lookup is None:
             return None
 
-        # An alias is found, then do the same _options check for that opt
-        alias_name = self._option_aliases.get(name, None)
+        alias_name, alias_modifier = lookup
 
         # If the alias isn't in the local gcode slicer opts, then just return None
         if alias_name not in self._options:
             return None
 
-        # Then see if that alias exists in the gcode slicer opts data
-        alias_value = self._options.get(alias_name, None)
-
-        # See if the alias has a modifier
-        modifier_index = (alias_name, name)
-        if modifier_index not in self._alias_modifiers:
-            # If not, then just return the aliased name and opt value
-            return {
-                "name":alias_name, 
-                "value":alias_value
-            }
-
-        # If a modifier lambda function is found, then use it to modify the opt value
-        alias_modifier = self._alias_modifiers.get(modifier_index, None)
-
-        # And that its callable
-        if callable(alias_modifier):
-            return {
-                "name":alias_name, 
-                "value":alias_modifier(alias_value)
-            }
+        alias_value = self._options[alias_name]
 
         return {
             "name":alias_name, 
-            "value":alias_value
+            "value":alias_modifier(alias_value) if alias_modifier else alias_value
         }
 
+    # Resolve the aliases and their modifiers once per class, rather than walking both dicts on every
+    # get_option. The names are interned like the parsed option names, so many aliases pointing at the
+    # same option share one string, and the lookups in self._options compare by identity.
+    @classmethod
+    def _build_option_lookup(cls) -> Mapping[str, Tuple[str, Optional[Callable]]]:
+        lookup = {}
+
+        for name, alias_name in cls._option_aliases.items():
+            alias_modifier = cls._alias_modifiers.get(name, None)
+            lookup[sys.intern(name)] = (sys.intern(alias_name), alias_modifier if callable(alias_modifier) else None)
+
+        return MappingProxyType(lookup)
+
     def _aliased_value(self, foreign_option: str, local_option: str, value: str|int|float|bool) -> Optional[str|int|float|bool]:
-        #_value = value
-        _value = self.get_option(local_option)
-        modifier = self._alias_modifiers.get((foreign_option, local_option), None)
+        modifier = self._alias_modifiers.get(foreign_option, None)
 
         if not modifier: 
             return value
@@ -239,7 +308,7 @@ class GenericSlicer(object):
             return modifier(value)
 
         # If the modifier object is a dictionary, then return that value if its present
-        if type(modifier) is dict:
+        if isinstance(modifier, dict):
             return modifier.get(value, value) 
 
         return value
@@ -252,11 +321,11 @@ class GenericSlicer(object):
         # If the slicer stores the settings at the bottom of the file (ie: were parsing in reverse), and
         # for some reason, they don't include a "config_end" phrase, then were best off just returning
         # None, or returning True if we can tell the fd pointer is at the end of the file.
-        if not self._options_end_pattern:
+        if not self._options_end_re:
             # Todo: Return TRUE if were at the end of the file and the config_end_str is empty
             return None
 
-        if re.match(self._options_end_pattern, line.strip()):
+        if self._options_end_re.match(line.strip()):
             return True
 
         return False
@@ -264,11 +333,11 @@ class GenericSlicer(object):
     # This is given a line to determine if it matches the beginning of the settings block or not.
     def is_options_start(self, line: str):
     
-        if not self._options_start_pattern:
+        if not self._options_start_re:
             # Todo: Return TRUE if were at the end of the file and the config_end_str is empty
             return None
 
-        if re.match(self._options_start_pattern, line.strip()):
+        if self._options_start_re.match(line.strip()):
             return True
 
         return False
@@ -279,57 +348,91 @@ class GenericSlicer(object):
     def get_options(self):
         return self._options
 
-    def _parse_line(self, line: str) -> List:
+    # Returns the (name, value) of an option line, or None
+    def _parse_line(self, line: str) -> Optional[Tuple[str, Any]]:
         if not line:
             return
 
-        parsed_line = re.match(r"^[\s;]*([a-zA-Z0-9_\s-]+) = (.+)$", line)
+        parsed_line = OPTION_LINE_PATTERN.match(line)
 
         # If no matches are found, then  abort
         if not parsed_line: return None
 
         # If there was a key and value found, return them
         if parsed_line[1] and parsed_line[2]: 
-            return {parsed_line[1]: self._cast(parsed_line[2])}
+            return (sys.intern(parsed_line[1]), self._cast(parsed_line[2]))
 
-    # Check if a string value is a decimal/float value
-    def _is_dec(self, value: str) -> bool:
-        """ Check if a string value is a decimal/float value """
+    # Used by the reverse reader for each raw line. Everything is matched as bytes, so only the key and
+    # value of an actual option line ever get decoded.
+    def _handle_line(self, line: bytes) -> Union[Tuple[str, Any], IterStatus]:
+        stripped = line.strip()
 
-        float_match = re.match(r"^\-?([0-9]+)\.([0-9]+)$", value)
+        # Reading in reverse, so the start of the options block is where the reader stops
+        if self._options_start_bytes_re is not None and self._options_start_bytes_re.match(stripped):
+            return self.IterStatus.END
 
-        return float_match is not None
+        if self._options_end_bytes_re is not None and self._options_end_bytes_re.match(stripped):
+            return self.IterStatus.BEGIN
+
+        parsed_line = OPTION_LINE_BYTES_PATTERN.match(line)
+        if parsed_line is None:
+            return self.IterStatus.NONE
+
+        value = parsed_line[2].decode("utf-8", "replace")
+
+        return (sys.intern(parsed_line[1].decode()), self._cast(value) if self._cast_values else value)
 
     # Cast a string value to its appropriate data type.
     def _cast(self, value: str) -> Any:
         """ Cast a string value to its appropriate data type. """
 
-        result = None
-        data_type = None
-
-        if type(value) is not str:
+        if not isinstance(value, str):
             return value
 
+        # Plain unsigned integers (0, 1, 100...) are the most common values of all, so they get turned
+        # around before anything else is done with them
+        if value.isdigit() and value.isascii():
+            return int(value)
+
         value = value.strip()
 
-        if value.lower() == "true": return True
-        if value.lower() == "false": return False
-        if value in ("none",""): return None
+        if not value: return None
 
-        try:
-            if self._is_dec(value) is True:
-                result = float(value)
-                data_type = type(result)
-                return result
-        except:
-            pass
+        # Most values are numbers, so dispatch on the first character instead of lowercasing and
+        # comparing every value, then trying each conversion in turn
+        first = value[0]
 
-        try:
-            result = int(value)
-            data_type = type(result)
-            return result
-        except:
-            pass
+        if first in NUMBER_FIRST_CHARACTERS or first.isdecimal():
+            # Check the shape up front rather than letting int()/float() raise on values like "50%" or
+            # "0x0,200x0". isascii() is needed too, since isdigit() also takes things like superscripts.
+            number = value[1:] if first in "+-" else value
+
+            if number.isascii():
+                if number.isdigit():
+                    return int(value)
+
+                # Only the -?[0-9]+.[0-9]+ shape is a float (so ".5", "5." and "+1.5" stay strings),
+                # the same as values have always been cast
+                whole, dot, fraction = number.partition(".")
+                if dot and first != "+" and whole.isdigit() and fraction.isdigit():
+                    return float(value)
+
+            # int() also takes "_" separators ("1_000") and non-ASCII digits, which are rare enough to
+            # just try
+            if "_" in number or not number.isascii():
+                try:
+                    return int(value)
+                except ValueError:
+                    pass
+
+            return value
+
+        if first in CONSTANT_FIRST_CHARACTERS:
+            lowered = value.lower()
+
+            if lowered == "true": return True
+            if lowered == "false": return False
+            if value == "none": return None
 
         return value
         
@@ -337,7 +440,7 @@ class GenericSlicer(object):
     def _percent_to_float(self, value: Optional[str]) -> float:
         """Convert a percentage value to a float (ratio) (75% -> 0.75)"""
 
-        if not value or type(value) is not str:
+        if not value or not isinstance(value, str):
             return
 
         if not value.endswith("%"):
@@ -381,7 +484,8 @@ class GenericSlicer(object):
         return bool(float(percent_value) == float(float_value))
 
     # Convert a numerical value to an int if it won't change the value, otherwise return an int
-    def _to_float_or_int(self, value: int|float|str) -> float|int:
+    @staticmethod
+    def _to_float_or_int(value: int|float|str) -> float|int:
         try:
             if (float_value := float(value)) == (int_value := int(float_value)):
                 return int_value
@@ -393,8 +497,10 @@ class GenericSlicer(object):
     # Method to invert a numerical value (eg: one slicer takes a positive compensation value, the other
     # takes an "expansion" value that would require a negative value). 
     # This method also handles the casting
-    def _invert_number(self, value: int|float|str):
-        number = self._to_float_or_int(value)
+    # Static so the subclasses can reference it directly in their _alias_modifiers class dicts.
+    @staticmethod
+    def _invert_number(value: int|float|str):
+        number = GenericSlicer._to_float_or_int(value)
 
         return -number
 
@@ -4,4 +4,16 @@ class OrcaSlicer(GenericSlicer):
 	_parse_reversed = True
 	_options_start_pattern: str = "; CONFIG_BLOCK_START"
 	_options_end_pattern: str = "; CONFIG_BLOCK_END"
-	pass
\ No newline at end of file
+
+	def parse(self):
+		parsed_options = {}
+
+		# The config block is read last line first, so it's put back in file order. The reader raises
+		# an EOFError if the file has no options.
+		for option_name, option_value in reversed(list(self._reverse_gcode_reader())):
+			if self._ignore_options and option_name in self._ignore_options:
+				continue
+
+			parsed_options[option_name] = option_value
+
+		self._options = parsed_options
\ No newline at end of file
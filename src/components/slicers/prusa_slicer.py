@@ -1,20 +1,52 @@
 from __future__ import annotations
 
+import mmap
 import os
 import json
 import re
 import sys
 from enum import Enum
+from functools import lru_cache
 from io import BufferedReader
+from types import MappingProxyType
+from typing import Any, Mapping, Tuple
 from .generic_slicer import GenericSlicer
 
+# Option lines in the config footer, run over the whole (raw bytes) block at once so that only the
+# key and value of an actual option line ever get decoded
+OPTIONS_BLOCK_PATTERN = re.compile(rb"^; ([A-Za-z0-9_-]+) = ([^\r\n]+)", re.MULTILINE)
+
+# The block pattern with the ignored options left out, so their lines never match at all. Cached since
+# every file of a slicer uses the same ignore list.
+@lru_cache(8)
+def _options_block_pattern(ignore_options: Tuple[str, ...] = ()) -> re.Pattern:
+    if not ignore_options:
+        return OPTIONS_BLOCK_PATTERN
+
+    ignored = b"|".join(re.escape(name.encode()) for name in ignore_options)
+
+    return re.compile(rb"^; (?!(?:" + ignored + rb") = )([A-Za-z0-9_-]+) = ([^\r\n]+)", re.MULTILINE)
+
+# First bytes of the values _cast_bytes can turn into something other than a str (same as the
+# NUMBER_FIRST_CHARACTERS/CONSTANT_FIRST_CHARACTERS sets GenericSlicer._cast uses)
+NUMBER_FIRST_BYTES = b"+-0123456789"
+CONSTANT_FIRST_BYTES = b"tTfFn"
+
+# The plain text ends of the begin/end patterns, used to find candidate lines with rfind before
+# checking them against the patterns themselves
+OPTIONS_START_TEXT = b"_config = begin"
+OPTIONS_END_TEXT = b"_config = end"
+
 class PrusaSlicer(GenericSlicer):
-    # These begin/end lines match PrusaSlicer and most of their legacy versions.
-    _options_start_pattern = r"^;.*_config = begin$"
-    _options_end_pattern = r"^;.*_config = end$"
+    # These begin/end lines match PrusaSlicer and most of their legacy versions. The name is matched with
+    # \S* rather than .*, so there's no backtracking over the rest of the line when it isn't one.
+    _options_start_pattern = r"^;\s*\S*_config = begin$"
+    _options_end_pattern = r"^;\s*\S*_config = end$"
 
     """Slicer configuration key aliases (for legacy or possible slicer cross compatibility)"""
-    _option_aliases = {
+    # Read-only, with the option names interned so the many aliases that point at the same option
+    # (eg: support_material_extrusion_width) all share one string
+    _option_aliases: Mapping[str, str] = MappingProxyType({sys.intern(name): sys.intern(alias_name) for name, alias_name in {
         # ALIAS_NAME: NAME_USED_IN_THIS_SLICER
         # https://github.com/supermerill/SuperSlicer/blob/9f87f80cae9b613d91a3cc581661e98d5b597605/src/libslic3r/PrintConfig.cpp#L8000-L8012
         # 
@@ -215,16 +247,15 @@ class PrusaSlicer(GenericSlicer):
         "support_interface_line_width":"support_material_extrusion_width",
         "support_roof_pattern":"top_fill_pattern",
         "support_interface_pattern":"support_material_interface_pattern"
-    }
+    }.items()})
     
     # if a comparison is done with compatibility enabled, any slicer option configs that are compared to
-    # aliased values, they can also be modified by creating a lambda function here with the local option
-    # name as the root key, then the aliased key in the nested dictionary
-    _alias_modifiers = {
-        ("first_layer_size_compensation","elefant_foot_compensation"): lambda option_value: self._invert_number(option_value),
-        ("xy_offset_layer_0","elefant_foot_compensation"): lambda option_value: self._invert_number(option_value),
-        ("brim_gap", "brim_separation"): lambda option_value: self._invert_number(option_value)
-    }
+    # aliased values, they can also be modified by adding a function here, keyed by the alias option name
+    _alias_modifiers = MappingProxyType({
+        "first_layer_size_compensation": GenericSlicer._invert_number,
+        "xy_offset_layer_0": GenericSlicer._invert_number,
+        "brim_gap": GenericSlicer._invert_number
+    })
    
 
     # TODO: Possibly methods to make the values comparable to other similar slicer options in
@@ -239,126 +270,108 @@ class PrusaSlicer(GenericSlicer):
     
     def parse(self):
         parsed_options = {}
+        options_count = 0
+        block_pattern = _options_block_pattern(tuple(self._ignore_options))
+
+        # Only the mapping ever reads the file, so it's opened as a bare descriptor rather than through
+        # open(), which would put a (never used) buffered reader on top of it
+        file_descriptor = os.open(self._file_path, os.O_RDONLY)
+        try:
+            # mmap can't map an empty file, and there'd be no options in one anyways
+            if not os.fstat(file_descriptor).st_size:
+                raise EOFError("No options found")
 
-        # Iterate over each line yielded from the _reverse_gcode_reader generator, adding each
-        # to the parsed_options dictionary if needed.
-        for line in self._reverse_gcode_reader():
-            if type(line) is dict:
-                # If the key returned is in the ignore_options, then skip it.
-                option_name = list(line).pop(0)
-                if self._ignore_options and option_name in self._ignore_options:
-                    self._logger.info(f"{option_name} WAS fund in self._ignore_options, skipping")
-                    continue
+            # With the file mapped, the begin/end lines are found with a couple of rfind calls, and only
+            # the pages those touch (the end of the file, where the block is) are read from disk
+            with mmap.mmap(file_descriptor, 0, access=mmap.ACCESS_READ) as gcode:
+                self._prefetch_tail(gcode)
+                config_block = self._find_config_block(gcode)
+
+                # Let the regex engine walk the block (in place, without copying it out of the mapping),
+                # so only the key and value of each option line are turned into Python strings. Options
+                # in ignore_options are already left out by the pattern.
+                if config_block is not None:
+                    for option_line in block_pattern.finditer(gcode, *config_block):
+                        options_count = options_count+1
+                        option_name = sys.intern(option_line[1].decode())
+                        option_value = option_line[2]
+                        parsed_options[option_name] = self._cast_bytes(option_value) if self._cast_values else option_value.decode("utf-8", "replace")
+        finally:
+            os.close(file_descriptor)
 
-                parsed_options.update(line)
+        if options_count == 0:
+            raise EOFError("No options found")
 
         self._options = parsed_options
 
-    def _reverse_gcode_reader(self):
-        in_options = False
-        is_completed = False
-        options_count = 0
-        try:
-            """A generator that returns the lines of a file in reverse order"""
-            with open(f"{self._gcode_root}/{self._filename}", "rb") as file_handle:
-                segment = None
-                offset = 0
-                file_handle.seek(0, os.SEEK_END)
-                file_size = remaining_size = file_handle.tell()
-
-                while remaining_size > 0:
-                    offset = min(file_size, offset + self._buffer_size)
-                    file_handle.seek(file_size - offset)
-                    buffer = file_handle.read(min(remaining_size, self._buffer_size))
-
-                    # remove file's last "\n" if it exists, only for the first buffer
-                    if remaining_size == file_size and buffer[-1] == ord("\n"):
-                        buffer = buffer[:-1]
-
-                    remaining_size -= self._buffer_size
-                    lines = buffer.split("\n".encode())
-
-                    # append last chunk's segment to this chunk's last line
-                    if segment is not None:
-                        lines[-1] += segment
-
-                    segment = lines[0]
-                    lines = lines[1:]
-
-                    # yield lines in this chunk except the segment
-                    for line in reversed(lines):
-                        # only decode on a parsed line, to avoid utf-8 decode error
-                        this_line = self._handle_line(line)
-
-                        # If we've reached the ending line (which is the line that contains 
-                        # prusaslicer_config = 'begin' since were reading it in reverse order), 
-                        # then determine what exception to raise..
-                        if this_line is self.IterStatus.END:
-                            # if we've somehow come here without ever having hit the begin
-                            # line, then raise an EOF.
-                            if in_options is False:
-                                raise EOFError("Encountered ending line without ever being in the footer")
-
-                            # Otherwise, end the generator
-                            raise GeneratorExit("Encountered ending")
-
-                        # If we've come across the beginning line (or prusaslicer_config = 'end"), 
-                        # then verify this was the first time.
-                        if this_line is self.IterStatus.BEGIN:
-                            if in_options is True:
-                                raise ValueError("Encountered the beginning line while already in options")
-
-                            in_options = True
-                            continue
-
-                        if type(this_line) is dict:
-                            options_count = options_count+1
-                            yield this_line
-
-                # Don't yield None if the file was empty
-                if segment is not None:
-                    this_line = self._handle_line(segment)
-                    if this_line is self.IterStatus.END:
-                        raise GeneratorExit("Encountered ending")
-
-                    if type(this_line) is dict:
-                        options_count = options_count+1
-                        yield this_line
+    # Find the options between the begin and end lines at the end of the file. Returns the (start, end)
+    # offsets of the block, or None if the file doesn't have one.
+    def _find_config_block(self, gcode: mmap.mmap):
+        footer_end = self._find_marker_line(gcode, OPTIONS_END_TEXT, self._options_end_bytes_re, 0, len(gcode))
+        if footer_end is None:
+            return None
 
-        except GeneratorExit as ge:
-            pass
-        finally:
-            if options_count == 0:
-                raise EOFError("No options found")
+        footer_begin = self._find_marker_line(gcode, OPTIONS_START_TEXT, self._options_start_bytes_re, 0, footer_end[0])
+        if footer_begin is None:
+            return None
+
+        return footer_begin[1], footer_end[0]
+
+    # Find the last line in buffer[start:end] that contains the text and matches the (begin or end)
+    # pattern. Returns the (start, end) offsets of that line, or None if there isn't one.
+    def _find_marker_line(self, buffer: bytes|mmap.mmap, text: bytes, pattern: re.Pattern, start: int, end: int):
+        while (index := buffer.rfind(text, start, end)) != -1:
+            line_start = max(start, buffer.rfind(b"\n", start, index) + 1)
+            line_end = buffer.find(b"\n", index, end)
+            line_end = end if line_end == -1 else line_end
+
+            if pattern.match(buffer[line_start:line_end].strip()):
+                return line_start, line_end
+
+            end = line_start
+
+        return None
+
+    # Same results as GenericSlicer._cast, but straight from the bytes matched in the config block. The
+    # numbers and booleans (most of a PrusaSlicer config) never get decoded into a str first, and
+    # bytes.isdigit() is ASCII only, so there's no isascii() check needed either.
+    def _cast_bytes(self, value: bytes) -> Any:
+        if value.isdigit():
+            return int(value)
 
-    def _parse_line(self, line:str):
-        if not line:
-            return
+        value = value.strip()
 
-        m = re.match(r"^; (?P<key>[a-zA-Z0-9_-]+) = (?P<val>.+)", str(line))
+        if not value: return None
 
-        if not m: return None
+        first = value[:1]
 
-        # If there was a key and value found, return them
-        if m.group("key") and m.group("val"): 
-            return {m.group("key"): self._cast(m.group("val")) if self._cast_values else m.group("val")}
+        if first in NUMBER_FIRST_BYTES:
+            number = value[1:] if first in b"+-" else value
 
-    def _handle_line(self, line):
-        line = line.decode("utf-8")
+            if number.isdigit():
+                return int(value)
 
-        if self.is_options_start(line):
-            return self.IterStatus.END
+            whole, dot, fraction = number.partition(b".")
+            if dot and first != b"+" and whole.isdigit() and fraction.isdigit():
+                return float(value)
 
-        if self.is_options_end(line):
-            return self.IterStatus.BEGIN
+            # "1_000" style separators and non-ASCII digits are left to _cast (and int())
+            if b"_" in number or not number.isascii():
+                return self._cast(value.decode("utf-8", "replace"))
 
-        parsed_line = self._parse_line(line=line)
+        elif first >= b"\x80":
+            # Non-ASCII (eg: other digits that int() takes), which is rare enough to just hand to _cast
+            return self._cast(value.decode("utf-8", "replace"))
 
-        if parsed_line is None:
-            return self.IterStatus.NONE
+        elif first in CONSTANT_FIRST_BYTES:
+            lowered = value.lower()
 
-        return parsed_line
+            if lowered == b"true": return True
+            if lowered == b"false": return False
+            if value == b"none": return None
 
+        # Percentages ("15%"), lists ("0x0,250x0"), gcode, etc. all stay strings
+        return value.decode("utf-8", "replace")
 
 if __name__ == "__main__" and __package__ is None:
     __package__ = "slicers.prusa_slicer.PrusaSlicer"
\ No newline at end of file